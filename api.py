@@ -85,15 +85,20 @@ async def chat(request: ChatRequest):
         else:
             msgs = request.history
 
+        # Swap the oldest turns for a cached rolling summary (if one is ready)
+        msgs = nm.compact_conversation(msgs)
+
         # 2. DIRECT JAILBREAK MODE - NO INTERPRETER, NO REFUSALS
         # Send straight to the jailbreak model exactly like machine.py direct mode
         msgs.append({"role": "user", "content": request.message})
         reply = nm.stream_response(msgs, temperature=1.2, print_output=False)
         msgs.append({"role": "assistant", "content": reply})
 
-        # 3. Context Window Management (Keep system prompt + last 11 messages)
-        if len(msgs) > 12:
-            msgs = [msgs[0]] + msgs[-11:]
+        # 3. Context Window Management (Keep system prompt + summary + last 11 messages)
+        msgs = nm.trim_conversation(msgs)
+
+        # 4. Summarize older turns off the request path, ready for the next turn
+        nm.schedule_summary(msgs)
 
         return {"response": msgs[-1]["content"], "messages": msgs}
 
@@ -0,0 +1,125 @@
+"""
+Benchmark rolling conversation summaries against a fake Groq upstream.
+
+Runs the same scripted long session through the /chat handler twice
+(compaction OFF, then ON) and reports prompt tokens and latency per turn.
+Every upstream request is counted: background summary calls are charged to
+the turn during which they were sent. The fake upstream simulates prefill
+cost proportional to prompt size.
+
+    python bench_summary.py [turns] [think_time_seconds]
+"""
+import asyncio
+import json
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import nm
+
+PREFILL_MS_PER_1K_TOKENS = 40   # simulated upstream prefill latency
+FIRST_TOKEN_MS = 20             # fixed upstream overhead per request
+REPLY = "Sure, here is a fairly detailed answer with some context and examples. " * 8
+THINK_TIME = 0.3                # user pause between turns (summary runs here)
+
+upstream_log = []   # (kind, prompt_tokens) for every upstream completion
+log_lock = threading.Lock()
+
+
+class FakeGroq(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        body = json.dumps({"data": [{"id": "llama-3.1-8b-instant"}]}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        payload = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        tokens = nm.estimate_tokens(payload["messages"])
+        kind = "summary" if payload["temperature"] == 0 else "chat"
+        with log_lock:
+            upstream_log.append((kind, tokens))
+        time.sleep((FIRST_TOKEN_MS + PREFILL_MS_PER_1K_TOKENS * tokens / 1000) / 1000)
+
+        reply = "Earlier the user asked a series of questions and got detailed answers." \
+            if kind == "summary" else REPLY
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.end_headers()
+        for i in range(0, len(reply), 32):
+            chunk = {"choices": [{"delta": {"content": reply[i:i + 32]}}]}
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+        self.wfile.write(b"data: [DONE]\n\n")
+
+
+def _drain_log():
+    with log_lock:
+        entries = list(upstream_log)
+        upstream_log.clear()
+    chat = sum(t for k, t in entries if k == "chat")
+    summary = sum(t for k, t in entries if k == "summary")
+    calls = sum(1 for k, _ in entries if k == "summary")
+    return chat, summary, calls
+
+
+def run_session(api, turns, enabled, think_time):
+    nm.SUMMARY_ENABLED = enabled
+    with nm._summary_lock:
+        nm._summary_cache.clear()
+    _drain_log()
+
+    history, rows = None, []
+    for turn in range(1, turns + 1):
+        req = api.ChatRequest(message=f"Question {turn}: tell me more about topic {turn}. " * 4,
+                              history=history)
+        start = time.perf_counter()
+        result = asyncio.run(api.chat(req))
+        latency = (time.perf_counter() - start) * 1000
+        history = result["messages"]
+        time.sleep(think_time)
+        rows.append(_drain_log() + (latency,))
+    # Let any in-flight summary finish so its tokens are counted
+    while nm._summary_pending:
+        time.sleep(0.01)
+    chat, summary, calls = _drain_log()
+    last = rows[-1]
+    rows[-1] = (last[0] + chat, last[1] + summary, last[2] + calls, last[3])
+    return rows
+
+
+def main():
+    turns = int(sys.argv[1]) if len(sys.argv) > 1 else 30
+    think_time = float(sys.argv[2]) if len(sys.argv) > 2 else THINK_TIME
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeGroq)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    nm.BASE_URL = f"http://127.0.0.1:{server.server_port}"
+
+    import api
+    off = run_session(api, turns, enabled=False, think_time=think_time)
+    on = run_session(api, turns, enabled=True, think_time=think_time)
+    server.shutdown()
+
+    print(f"{'turn':>4} | {'tokens off':>10} | {'chat on':>8} {'summary on':>10} {'total on':>8} | {'ms off':>8} {'ms on':>8}")
+    print("-" * 74)
+    for i, (o, n) in enumerate(zip(off, on), 1):
+        t_off = o[0] + o[1]
+        print(f"{i:>4} | {t_off:>10} | {n[0]:>8} {n[1]:>10} {n[0] + n[1]:>8} | {o[3]:>8.1f} {n[3]:>8.1f}")
+    print("-" * 74)
+    tot_off = sum(r[0] + r[1] for r in off)
+    chat_on, summary_on = sum(r[0] for r in on), sum(r[1] for r in on)
+    tot_on = chat_on + summary_on
+    avg_off, avg_on = sum(r[3] for r in off) / turns, sum(r[3] for r in on) / turns
+    print(f"total prompt tokens: off={tot_off} on={tot_on} "
+          f"(chat={chat_on} + summary={summary_on} over {sum(r[2] for r in on)} calls, "
+          f"{100 * (tot_off - tot_on) / tot_off:.1f}% saved)")
+    print(f"mean latency (ms):   off={avg_off:.1f} on={avg_on:.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,7 +2,10 @@ import requests
 import json
 import os
 import sys
-from collections import Counter
+import hashlib
+import threading
+from collections import Counter, OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 
 # Load variables from .env file
@@ -97,6 +100,134 @@ def transcribe_audio(audio_bytes):
         print(f"[!] Transcription Error: {e}")
         return ""
 
+# ────────────────────────────────────────────────
+#  ROLLING CONVERSATION SUMMARY (prompt compaction)
+# ────────────────────────────────────────────────
+SUMMARY_ENABLED = os.getenv("SUMMARY_ENABLED", "false").lower() in ("1", "true", "yes")
+SUMMARY_TRIGGER_TOKENS = int(os.getenv("SUMMARY_TRIGGER_TOKENS", "1000"))
+SUMMARY_KEEP_MESSAGES = max(0, int(os.getenv("SUMMARY_KEEP_MESSAGES", "4")))
+SUMMARY_CACHE_SIZE = int(os.getenv("SUMMARY_CACHE_SIZE", "256"))
+SUMMARY_MAX_PENDING = int(os.getenv("SUMMARY_MAX_PENDING", "8"))
+SUMMARY_PREFIX = "[Conversation summary] "
+
+_summary_cache = OrderedDict()   # prefix key -> summary text (LRU)
+_summary_pending = set()         # prefix keys queued or running
+_summary_lock = threading.Lock()
+_summary_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="summary")
+
+def estimate_tokens(messages):
+    # Rough estimate (~4 chars per token), good enough for thresholds and reporting
+    return sum(len(m.get("content") or "") for m in messages) // 4
+
+def is_summary(message):
+    return message.get("role") == "system" and (message.get("content") or "").startswith(SUMMARY_PREFIX)
+
+def _summary_window(messages):
+    """Messages that could be folded into the summary, or [] if below threshold."""
+    if not SUMMARY_ENABLED or estimate_tokens(messages[1:]) < SUMMARY_TRIGGER_TOKENS:
+        return []
+    return messages[1:len(messages) - SUMMARY_KEEP_MESSAGES]
+
+def _summary_keys(messages, window):
+    """
+    One key per prefix of the window: keys[i] hashes the system prompt and
+    every message up to window[i], so a cached summary is only reused when
+    exactly the history it covers is still present.
+    """
+    digest = hashlib.sha1()
+    digest.update(json.dumps(messages[0], sort_keys=True, ensure_ascii=False).encode("utf-8"))
+    keys = []
+    for m in window:
+        digest.update(b"\n" + json.dumps(m, sort_keys=True, ensure_ascii=False).encode("utf-8"))
+        keys.append(digest.hexdigest())
+    return keys
+
+def summarize_messages(window):
+    lines = []
+    for m in window:
+        content = m.get("content") or ""
+        if is_summary(m):
+            lines.append(f"Summary so far: {content[len(SUMMARY_PREFIX):]}")
+        else:
+            lines.append(f"{m.get('role') or 'user'}: {content}")
+    summary_prompt = [
+        {"role": "system", "content": (
+            "Summarize the conversation below for use as context in later turns. "
+            "Keep names, facts, decisions, user preferences and open questions. "
+            "Write compact plain prose, no preamble, under 200 words."
+        )},
+        {"role": "user", "content": "\n".join(lines)}
+    ]
+    return stream_response(summary_prompt, temperature=0.0, print_output=False).strip()
+
+def _build_summary(key, window):
+    try:
+        summary = summarize_messages(window)
+        if summary:
+            with _summary_lock:
+                _summary_cache[key] = summary
+                _summary_cache.move_to_end(key)
+                while len(_summary_cache) > SUMMARY_CACHE_SIZE:
+                    _summary_cache.popitem(last=False)
+    except Exception as e:
+        print(f"[!] Summary Error: {e}")
+    finally:
+        with _summary_lock:
+            _summary_pending.discard(key)
+
+def schedule_summary(messages):
+    """Start summarizing the oldest turns in the background (never blocks)."""
+    window = _summary_window(messages)
+    if not window:
+        return None
+    keys = _summary_keys(messages, window)
+    with _summary_lock:
+        # A summary for an earlier prefix of this conversation is still
+        # usable (or on its way), so don't start a competing one
+        if any(k in _summary_pending or k in _summary_cache for k in keys):
+            return None
+        if len(_summary_pending) >= SUMMARY_MAX_PENDING:
+            return None
+        _summary_pending.add(keys[-1])
+    _summary_executor.submit(_build_summary, keys[-1], window)
+    return keys[-1]
+
+def compact_conversation(messages):
+    """Replace the oldest turns with the newest cached summary that covers them."""
+    window = _summary_window(messages)
+    keys = _summary_keys(messages, window)
+    with _summary_lock:
+        for end in range(len(keys) - 1, -1, -1):
+            key = keys[end]
+            if key in _summary_cache:
+                _summary_cache.move_to_end(key)
+                summary = _summary_cache[key]
+                break
+        else:
+            return messages
+    return [messages[0], {"role": "system", "content": SUMMARY_PREFIX + summary}] + messages[end + 2:]
+
+def _summary_tracked(messages):
+    """True if a summary for a prefix of this history is cached or on its way."""
+    window = _summary_window(messages)
+    if not window:
+        return False
+    keys = _summary_keys(messages, window)
+    with _summary_lock:
+        return any(k in _summary_pending or k in _summary_cache for k in keys)
+
+def trim_conversation(messages, max_messages=12):
+    """Keep system prompt (+ rolling summary) and the most recent messages."""
+    head = messages[:2] if len(messages) > 1 and is_summary(messages[1]) else messages[:1]
+    tail_size = max_messages - 1
+    if len(messages) <= len(head) + tail_size:
+        return messages
+    # Trimming changes the prefix a summary is keyed on; hold off (up to
+    # twice the window) so the next turn can still compact with it
+    if len(messages) <= 2 * max_messages and _summary_tracked(messages):
+        return messages
+    return head + messages[-tail_size:]
+
 # ────────────────────────────────────────────────
 #  REFUSAL DETECTION
 # ────────────────────────────────────────────────
@@ -0,0 +1,208 @@
+import time
+import nm
+
+SYSTEM = {"role": "system", "content": "You are Charlie."}
+ORIGINAL_SUMMARIZE = nm.summarize_messages
+ORIGINAL_SETTINGS = {name: getattr(nm, name) for name in (
+    "SUMMARY_ENABLED", "SUMMARY_TRIGGER_TOKENS", "SUMMARY_KEEP_MESSAGES",
+    "SUMMARY_CACHE_SIZE", "SUMMARY_MAX_PENDING")}
+
+def make_conversation(turns, size=400):
+    msgs = [dict(SYSTEM)]
+    for i in range(turns):
+        msgs.append({"role": "user", "content": f"question {i} " + "q" * size})
+        msgs.append({"role": "assistant", "content": f"answer {i} " + "a" * size})
+    return msgs
+
+def reset_summary_state(summary_text="SUMMARY"):
+    nm.SUMMARY_ENABLED = True
+    nm.SUMMARY_TRIGGER_TOKENS = 1000
+    nm.SUMMARY_KEEP_MESSAGES = 4
+    nm.SUMMARY_CACHE_SIZE = 256
+    nm.SUMMARY_MAX_PENDING = 8
+    with nm._summary_lock:
+        nm._summary_cache.clear()
+        nm._summary_pending.clear()
+    folded = []
+    def fake_summarize(window):
+        folded.append(window)
+        return summary_text
+    nm.summarize_messages = fake_summarize
+    return folded
+
+def wait_idle():
+    for _ in range(200):
+        if not nm._summary_pending:
+            return
+        time.sleep(0.01)
+    raise AssertionError("summary never finished")
+
+def teardown_function(function=None):
+    # Run by pytest after every test, and by the __main__ block below
+    wait_idle()
+    nm.summarize_messages = ORIGINAL_SUMMARIZE
+    for name, value in ORIGINAL_SETTINGS.items():
+        setattr(nm, name, value)
+    with nm._summary_lock:
+        nm._summary_cache.clear()
+
+def test_threshold_and_window():
+    print("Testing threshold and window boundaries...")
+    reset_summary_state()
+    small = make_conversation(3, size=100)  # ~150 tokens
+    assert nm._summary_window(small) == []
+    assert nm.schedule_summary(small) is None
+
+    big = make_conversation(6)  # ~1200 tokens
+    window = nm._summary_window(big)
+    assert window == big[1:-4]
+    assert nm.compact_conversation(big) is big  # nothing cached yet
+
+    nm.SUMMARY_KEEP_MESSAGES = 0
+    assert nm._summary_window(big) == big[1:]
+
+    nm.SUMMARY_ENABLED = False
+    assert nm._summary_window(big) == []
+    print("OK")
+
+def test_summary_reused_when_ready():
+    print("Testing summary reuse...")
+    folded = reset_summary_state()
+    msgs = make_conversation(6)
+    assert nm.schedule_summary(msgs) is not None
+    wait_idle()
+    assert len(folded) == 1 and folded[0] == msgs[1:-4]
+
+    # Client echoes history plus a new turn: summary still applies
+    msgs = msgs + [{"role": "user", "content": "next"}, {"role": "assistant", "content": "reply"}]
+    compacted = nm.compact_conversation(msgs)
+    assert compacted[0] == SYSTEM
+    assert nm.is_summary(compacted[1]) and compacted[1]["content"].endswith("SUMMARY")
+    assert compacted[2:] == msgs[-6:]
+    print("OK")
+
+def test_no_duplicate_while_pending():
+    print("Testing pending summaries are not duplicated...")
+    reset_summary_state()
+    msgs = make_conversation(6)
+    with nm._summary_lock:
+        pending = nm._summary_keys(msgs, nm._summary_window(msgs))[-1]
+        nm._summary_pending.add(pending)
+    msgs = msgs + [{"role": "user", "content": "next"}, {"role": "assistant", "content": "reply"}]
+    assert nm.schedule_summary(msgs) is None
+    with nm._summary_lock:
+        nm._summary_pending.discard(pending)
+
+    reset_summary_state()
+    nm.SUMMARY_MAX_PENDING = 0
+    assert nm.schedule_summary(make_conversation(6)) is None
+    print("OK")
+
+def test_cache_is_bounded():
+    print("Testing summary cache eviction...")
+    reset_summary_state()
+    nm.SUMMARY_CACHE_SIZE = 2
+    for i in range(4):
+        msgs = make_conversation(6)
+        msgs[1]["content"] += str(i)
+        nm.schedule_summary(msgs)
+        wait_idle()
+    assert len(nm._summary_cache) == 2
+    print("OK")
+
+def test_trim_keeps_summary():
+    print("Testing trim keeps summary...")
+    summary = {"role": "system", "content": nm.SUMMARY_PREFIX + "earlier stuff"}
+    msgs = [dict(SYSTEM), summary] + make_conversation(8, size=10)[1:]
+    trimmed = nm.trim_conversation(msgs)
+    assert trimmed[:2] == [SYSTEM, summary]
+    assert trimmed[2:] == msgs[-11:]
+
+    plain = make_conversation(8, size=10)
+    trimmed = nm.trim_conversation(plain)
+    assert trimmed == [plain[0]] + plain[-11:]
+    print("OK")
+
+def test_old_summary_folded_into_new():
+    print("Testing rolling summary folding...")
+    folded = reset_summary_state("NEWER")
+    summary = {"role": "system", "content": nm.SUMMARY_PREFIX + "older summary"}
+    msgs = [dict(SYSTEM), summary] + make_conversation(6)[1:]
+    nm.schedule_summary(msgs)
+    wait_idle()
+    assert folded[0][0] is summary
+
+    compacted = nm.compact_conversation(msgs)
+    assert [m for m in compacted if nm.is_summary(m)] == [compacted[1]]
+    assert compacted[1]["content"] == nm.SUMMARY_PREFIX + "NEWER"
+    print("OK")
+
+def turn(label, size=800):
+    return [{"role": "user", "content": f"{label} " + "q" * size},
+            {"role": "assistant", "content": f"{label} " + "a" * size}]
+
+def test_shared_pair_not_reused_across_conversations():
+    print("Testing summaries are not shared between conversations...")
+    reset_summary_state("SUMMARY OF A")
+    pair = [{"role": "user", "content": "hi"}, {"role": "assistant", "content": ""}]
+    a = [dict(SYSTEM)] + turn("a1") + pair + turn("a2") + turn("a3")
+    nm.schedule_summary(a)
+    wait_idle()
+    assert nm.is_summary(nm.compact_conversation(a)[1])
+
+    b = [dict(SYSTEM)] + turn("b1") + pair + turn("b2") + turn("b3")
+    assert nm._summary_window(b)[-2:] == nm._summary_window(a)[-2:] == pair
+    assert nm.compact_conversation(b) is b
+    print("OK")
+
+def test_repeated_pair_in_same_conversation():
+    print("Testing a repeated pair does not fold unseen turns...")
+    reset_summary_state()
+    pair = [{"role": "user", "content": "hi"}, {"role": "assistant", "content": ""}]
+    msgs = [dict(SYSTEM)] + turn("c1") + pair + turn("c2") + turn("c3")
+    nm.schedule_summary(msgs)
+    wait_idle()
+    # Same pair shows up again later; only the prefix that was summarized is folded
+    msgs = msgs + pair + turn("c4") + turn("c5")
+    compacted = nm.compact_conversation(msgs)
+    assert compacted[2:] == msgs[5:]
+    print("OK")
+
+def test_trim_waits_for_summary():
+    print("Testing trim keeps the prefix a summary is keyed on...")
+    reset_summary_state()
+    msgs = make_conversation(6)
+    nm.schedule_summary(msgs)
+    wait_idle()
+    longer = msgs + make_conversation(1)[1:]
+    assert nm.trim_conversation(longer) is longer
+    assert nm.is_summary(nm.compact_conversation(longer)[1])
+
+    too_long = msgs + make_conversation(7)[1:]
+    assert len(nm.trim_conversation(too_long)) == 12
+    print("OK")
+
+def test_missing_content():
+    print("Testing messages without content...")
+    msgs = [dict(SYSTEM), {"role": "user"}, {"role": "assistant", "content": None}]
+    captured = []
+    original = nm.stream_response
+    nm.stream_response = lambda messages, **kw: captured.append(messages) or "ok"
+    try:
+        assert ORIGINAL_SUMMARIZE(msgs[1:]) == "ok"
+    finally:
+        nm.stream_response = original
+    assert "user: " in captured[0][1]["content"]
+    print("OK")
+
+if __name__ == "__main__":
+    for test in (test_threshold_and_window, test_summary_reused_when_ready,
+                 test_no_duplicate_while_pending, test_cache_is_bounded,
+                 test_trim_keeps_summary, test_old_summary_folded_into_new,
+                 test_shared_pair_not_reused_across_conversations,
+                 test_repeated_pair_in_same_conversation,
+                 test_trim_waits_for_summary, test_missing_content):
+        try:
+            test()
+        finally:
+            teardown_function(test)